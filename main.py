@@ -1,14 +1,26 @@
 import os
-import json
+import io
+import math
+import time
+import hashlib
+import orjson
 import shutil
+import random
 import asyncio
 import logging
+import zipfile
 import aiohttp
+import tempfile
 from pathlib import Path
+from functools import partial
+from types import MappingProxyType
+from typing import Callable, Mapping
+from datetime import timedelta
 from dotenv import load_dotenv
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import filters, MessageHandler, ApplicationBuilder, ContextTypes, CommandHandler, CallbackQueryHandler
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from telegram.ext import filters, Application, MessageHandler, ApplicationBuilder, ContextTypes, CommandHandler, CallbackQueryHandler
 
 from signalstickers_client import StickersClient
 from signalstickers_client.models import LocalStickerPack, Sticker
@@ -20,25 +32,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Environment, read once at startup
+load_dotenv()
+SIGNAL_UUID: str | None = os.getenv("SIGNAL_UUID")
+SIGNAL_PASSWORD: str | None = os.getenv("SIGNAL_PASSWORD")
+SIGNAL_ENABLED: bool = bool(SIGNAL_UUID and SIGNAL_PASSWORD)
+KEEP_FILES: bool = os.getenv("KEEP_FILES", "").lower() in ("1", "true", "yes")
+
 # Constants
 STICKER_FILE_SUFFIX_LENGTH: int = 3
+STICKER_SUFFIX_FORMAT: Callable[[int], str] = f"{{:0{STICKER_FILE_SUFFIX_LENGTH}d}}".format
 DOWNLOADS_DIR: Path = Path("downloads")
 THUMBNAIL_NAME: str = "thumbnail.webp"
 SIGNAL_CACHE: str = "signal_cache.json"
-MESSAGES: dict[str, str] = {
+DOWNLOAD_CHUNK_SIZE: int = 64 * 1024
+MAX_CONCURRENT_REQUESTS: int = 32
+MAX_PACK_DOWNLOADS: int = 16
+MAX_SIGNAL_READS: int = 8
+DOWNLOAD_TIMEOUT: float = 60.0
+BOT_API_POOL_SIZE: int = 64
+MAX_CONCURRENT_UPDATES: int = 32
+RETRY_ATTEMPTS: int = 5
+RETRY_MAX_DELAY: float = 30.0
+RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+FILE_PATH_TTL: float = 55 * 60.0
+FILE_PATH_CACHE_SIZE: int = 8192
+ARCHIVE_CACHE_TTL: float = 86400.0
+ARCHIVE_CACHE_SIZE: int = 1024
+IO_BUFFER_SIZE: int = 1024 * 1024
+MESSAGES: Mapping[str, str] = MappingProxyType({
     "start": "Send me a sticker to download its pack! Use /help for instructions.",
     "no_pack": "This sticker is not part of a pack.",
-    "downloading": "⬇️ Downloading {pack_title} ({pack_name})...",
-    "archive_caption": "📦 {pack_title} Sticker Pack",
     "signal_processing": "⬆️ Uploading the pack to signal...",
-    "signal_upload": "🚀 Sticker pack uploaded to Signal: {signal_url}",
     "error": "❌ An error occurred while processing the sticker pack.",
     "signal_credentials_missing": "⚠️ Signal upload disabled - missing credentials in environment"
-}
+})
+# Templated messages are f-string closures so no format string is parsed per call
+MESSAGE_TEMPLATES: Mapping[str, Callable[..., str]] = MappingProxyType({
+    "downloading": lambda pack_title, pack_name: f"⬇️ Downloading {pack_title} ({pack_name})...",
+    "archive_caption": lambda pack_title: f"📦 {pack_title} Sticker Pack",
+    "signal_upload": lambda signal_url: f"🚀 Sticker pack uploaded to Signal: {signal_url}"
+})
 
 # Global state
-user_modes: dict[str, bool] = {}
-signal_enabled: bool = False
+signal_cache: dict[str, str] = {}
+signal_cache_lock = asyncio.Lock()
+request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+file_path_cache: dict[str, tuple[float, str]] = {}
+archive_cache: dict[str, tuple[float, str, str, tuple[str, ...]]] = {}
+pending_archives: dict[str, asyncio.Future] = {}
+
+class PackStickerFilter(filters.MessageFilter):
+    # Matches only stickers that belong to a pack, so pack-less ones never reach the download handler
+    def filter(self, message) -> bool:
+        return bool(message.sticker and message.sticker.set_name)
+
+PACK_STICKER = PackStickerFilter()
 
 async def start(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(MESSAGES["start"])
@@ -53,26 +102,27 @@ async def help_cmd(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     )
     await update.message.reply_text(help_text)
 
-async def mode_command(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id: int = update.effective_user.id
-    current_mode: bool = user_modes.get(user_id, False)
+async def no_pack_sticker(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(MESSAGES["no_pack"])
+
+async def mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    current_mode: bool = context.user_data.get("upload_mode", False)
     mode_text: str = "Upload to Signal" if current_mode else "Download only"
     keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("Toggle Mode", callback_data="toggle_upload")]])
     await update.message.reply_text(f"Current mode: {mode_text}", reply_markup=keyboard)
 
-async def toggle_upload_callback(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+async def toggle_upload_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
-    user_id: int = query.from_user.id
-    current_mode: bool = user_modes.get(user_id, False)
+    current_mode: bool = context.user_data.get("upload_mode", False)
     # If signal is not enabled, inform the user and set to download onloy mode
-    if not signal_enabled:
+    if not SIGNAL_ENABLED:
         await query.edit_message_text(MESSAGES["signal_credentials_missing"])
-        user_modes[user_id] = False
+        context.user_data["upload_mode"] = False
         return
     # Toggle mode
-    user_modes[user_id] = not current_mode
-    new_mode_text: str = "Upload to Signal" if user_modes[user_id] else "Download only"
+    context.user_data["upload_mode"] = not current_mode
+    new_mode_text: str = "Upload to Signal" if context.user_data["upload_mode"] else "Download only"
     keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("Toggle Mode", callback_data="toggle_upload")]])
     await query.edit_message_text(f"Mode changed to: {new_mode_text}", reply_markup=keyboard)
 
@@ -80,155 +130,430 @@ def read_signal_cache() -> dict:
     if not Path(SIGNAL_CACHE).exists():
         return {}
     try:
-        with open(SIGNAL_CACHE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError) as e:
+        return orjson.loads(Path(SIGNAL_CACHE).read_bytes())
+    except (orjson.JSONDecodeError, IOError) as e:
         logger.error(f"Cache read error: {e}")
         return {}
 
 def write_signal_cache(data: dict) -> None:
+    # Write to a unique temporary file first so a crash never leaves a truncated cache behind
+    cache_path = Path(SIGNAL_CACHE)
+    tmp_path: str | None = None
     try:
-        with open(SIGNAL_CACHE, 'w') as f:
-            json.dump(data, f, indent=2)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=f"{cache_path.name}.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, cache_path)
     except IOError as e:
         logger.error(f"Cache write error: {e}")
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
 
-async def upload_to_signal(pack_dir: Path) -> str | None:
-    # Load metadata
-    metadata_file = pack_dir / "metadata.json"
-    metadata = json.loads(metadata_file.read_text(encoding="utf-8"))
+async def flush_signal_cache() -> None:
+    # Serialize flushes so an older snapshot can never replace a newer one on disk
+    async with signal_cache_lock:
+        await asyncio.get_running_loop().run_in_executor(None, write_signal_cache, dict(signal_cache))
+
+def read_optional_bytes(path: Path) -> bytes | None:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+async def read_file_limited(semaphore: asyncio.Semaphore, reader: Callable[[Path], bytes | None], path: Path) -> bytes | None:
+    async with semaphore:
+        return await asyncio.get_running_loop().run_in_executor(None, reader, path)
+
+async def upload_to_signal(pack_dir: Path, metadata: dict | None = None) -> str | None:
+    # Load metadata, unless the caller already has it from downloading the pack
+    if metadata is None:
+        metadata = orjson.loads((pack_dir / "metadata.json").read_bytes())
     # Create pack
     pack = LocalStickerPack()
     pack.title = metadata.get("title", "Converted pack from Telegram")
     pack.author = metadata.get("name", "Telegram Converter Bot")
-    # Add stickers
-    for file_suffix, emoji in metadata.get("emojis").items():
+    # Read the cover and all sticker images concurrently off the event loop, a few files at a time
+    emojis: dict = metadata.get("emojis")
+    read_semaphore = asyncio.Semaphore(MAX_SIGNAL_READS)
+    cover_data, *images = await asyncio.gather(
+        read_file_limited(read_semaphore, read_optional_bytes, pack_dir / THUMBNAIL_NAME),
+        *[read_file_limited(read_semaphore, Path.read_bytes, pack_dir / f"{file_suffix}.webp") for file_suffix in emojis]
+    )
+    # Add stickers, ids follow insertion order so they can come from enumerate
+    add_sticker = pack._addsticker
+    for sticker_id, (emoji, image_data) in enumerate(zip(emojis.values(), images)):
         sticker = Sticker()
-        sticker.id = pack.nb_stickers
-        sticker.emoji = emoji
-        sticker_path = pack_dir / f"{file_suffix}.webp"
-        with open(sticker_path, "rb") as f:
-            sticker.image_data = f.read()
-        pack._addsticker(sticker)
-    # Set cover image
-    cover_path = pack_dir / THUMBNAIL_NAME
+        sticker.id, sticker.emoji, sticker.image_data = sticker_id, emoji, image_data
+        add_sticker(sticker)
+    del images
+    # Set cover image, bytes are immutable so the first sticker's data can be shared as-is
     cover = Sticker()
     cover.id = pack.nb_stickers
-    try:
-        with open(cover_path, "rb") as f:
-            cover.image_data = f.read()
-    except FileNotFoundError:
-        cover.image_data = pack.stickers[0].image_data[:]
+    cover.image_data = cover_data if cover_data is not None else pack.stickers[0].image_data
     pack.cover = cover
     # Upload to Signal
     try:
-        async with StickersClient(os.getenv("SIGNAL_UUID"), os.getenv("SIGNAL_PASSWORD")) as client:
+        async with StickersClient(SIGNAL_UUID, SIGNAL_PASSWORD) as client:
             pack_id, pack_key = await client.upload_pack(pack)
     except Exception as e:
         logger.error(f"Signal upload failed: {e}")
         return None
     return f"https://signal.art/addstickers/#pack_id={pack_id}&pack_key={pack_key}"
 
-async def download_sticker(session: aiohttp.ClientSession, url: str, path: Path) -> bool:
-    try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                content = await response.read()
-                path.write_bytes(content)
-                logger.debug(f"Downloaded: {path.name}")
-                return True
-            logger.error(f"Download failed: {url} ({response.status})")
-    except Exception as e:
-        logger.error(f"Download error: {url} - {str(e)}")
+def retry_delay(attempt: int, retry_after: str | float | timedelta | None = None) -> float:
+    # Honor the server's hint as-is when usable (flood waits can be long),
+    # otherwise back off exponentially with jitter up to RETRY_MAX_DELAY
+    if isinstance(retry_after, timedelta):
+        retry_after = retry_after.total_seconds()
+    if retry_after is not None:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = math.nan
+        if math.isfinite(delay):
+            return max(delay, 0.0)
+    return min(2 ** attempt, RETRY_MAX_DELAY) + random.random()
+
+async def get_file_limited(context: ContextTypes.DEFAULT_TYPE, file_id: str):
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            async with request_semaphore:
+                return await context.bot.get_file(file_id)
+        except RetryAfter as e:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            delay = retry_delay(attempt, e.retry_after)
+        except BadRequest:
+            raise
+        except NetworkError as e:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            logger.warning(f"get_file retry: {file_id} - {str(e)}")
+            delay = retry_delay(attempt)
+        await asyncio.sleep(delay)
+
+async def get_file_path(context: ContextTypes.DEFAULT_TYPE, media) -> str:
+    # Telegram file paths stay valid for at least an hour, so repeat packs skip the round-trip.
+    # The cache expires a few minutes early so a link is never used right at that boundary.
+    # Keyed by file_unique_id since file_id can differ between get_sticker_set responses
+    cached = file_path_cache.get(media.file_unique_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    sticker_file = await get_file_limited(context, media.file_id)
+    # Re-insert so the dict stays ordered oldest first for eviction
+    file_path_cache.pop(media.file_unique_id, None)
+    file_path_cache[media.file_unique_id] = (time.monotonic() + FILE_PATH_TTL, sticker_file.file_path)
+    if len(file_path_cache) > FILE_PATH_CACHE_SIZE:
+        del file_path_cache[next(iter(file_path_cache))]
+    return sticker_file.file_path
+
+def discard_download(target: Path | io.BytesIO) -> None:
+    # Never leave a partial file behind, it would be treated as already downloaded
+    if isinstance(target, Path):
+        target.unlink(missing_ok=True)
+    else:
+        target.seek(0)
+        target.truncate()
+
+async def download_sticker(session: aiohttp.ClientSession, pack_semaphore: asyncio.Semaphore, url: str, target: Path | io.BytesIO) -> bool:
+    for attempt in range(RETRY_ATTEMPTS):
+        retry_after: str | None = None
+        try:
+            async with pack_semaphore, request_semaphore, session.get(url) as response:
+                if response.status == 200:
+                    if isinstance(target, Path):
+                        # Stream to disk so the whole body is never held in memory.
+                        # Open and close (which flushes) run in the executor, chunk writes only fill the buffer
+                        loop = asyncio.get_running_loop()
+                        f = await loop.run_in_executor(None, partial(target.open, "wb", buffering=IO_BUFFER_SIZE))
+                        try:
+                            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
+                        finally:
+                            await loop.run_in_executor(None, f.close)
+                    else:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            target.write(chunk)
+                    logger.debug(f"Downloaded: {url}")
+                    return True
+                if response.status not in RETRY_STATUSES:
+                    logger.error(f"Download failed: {url} ({response.status})")
+                    return False
+                retry_after = response.headers.get("Retry-After")
+                logger.warning(f"Download retry: {url} ({response.status})")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            discard_download(target)
+            logger.warning(f"Download retry: {url} - {str(e)}")
+        except Exception as e:
+            discard_download(target)
+            logger.error(f"Download error: {url} - {str(e)}")
+            return False
+        if attempt < RETRY_ATTEMPTS - 1:
+            await asyncio.sleep(retry_delay(attempt, retry_after))
+    logger.error(f"Download failed after {RETRY_ATTEMPTS} attempts: {url}")
     return False
 
-async def download_pack_assets(context: ContextTypes.DEFAULT_TYPE, sticker_set, pack_dir: Path) -> None:
-    needed_stickers: list = []
-    emoji_mapping: dict = {}
+def serialize_pack_metadata(metadata: dict) -> bytes:
+    # orjson emits UTF-8 bytes directly, so there is no intermediate str to encode
+    return orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+def save_pack_metadata(pack_dir: Path, metadata: dict) -> None:
+    (pack_dir / "metadata.json").write_bytes(serialize_pack_metadata(metadata))
+
+def plan_pack_assets(sticker_set, existing: set[str], known_files: dict[str, str]) -> tuple[list[tuple], dict]:
+    stickers = sticker_set.stickers
     # Collect regular stickers
-    for idx, sticker in enumerate(sticker_set.stickers):
-        file_suffix = f"{idx:0{STICKER_FILE_SUFFIX_LENGTH}d}"
-        emoji_mapping[file_suffix] = sticker.emoji
-        sticker_path = pack_dir / f"{file_suffix}.{'webm' if sticker.is_video else 'webp'}";
-        if not sticker_path.exists():
-            needed_stickers.append((sticker.file_id, sticker_path))
+    suffixes: list[str] = [STICKER_SUFFIX_FORMAT(idx) for idx in range(len(stickers))]
+    emoji_mapping: dict = dict(zip(suffixes, (sticker.emoji for sticker in stickers)))
+    file_names: list[str] = [
+        f"{suffix}.{'webm' if sticker.is_video else 'webp'}" for suffix, sticker in zip(suffixes, stickers)
+    ]
+    assets: list[tuple] = list(zip(stickers, file_names))
     # Collect thumbnail if available
-    thumbnail_path = pack_dir / THUMBNAIL_NAME
-    if sticker_set.thumbnail and not thumbnail_path.exists():
-        needed_stickers.append((sticker_set.thumbnail.file_id, thumbnail_path))
-    if not needed_stickers:
-        return
-    # Get file URLs in parallel
-    file_ids = [fid for fid, _ in needed_stickers]
-    sticker_files = await asyncio.gather(*[context.bot.get_file(fid) for fid in file_ids])
-    # Download all assets in parallel
-    async with aiohttp.ClientSession() as session:
-        tasks = [download_sticker(session, sf.file_path, path) for sf, (_, path) in zip(sticker_files, needed_stickers)]
-        await asyncio.gather(*tasks)
-    # Save metadata
+    if sticker_set.thumbnail:
+        assets.append((sticker_set.thumbnail, THUMBNAIL_NAME))
+    # A file is only reused if it is on disk and still holds the same Telegram file
+    needed_stickers: list[tuple] = [
+        (media, file_name) for media, file_name in assets
+        if file_name not in existing or known_files.get(file_name) != media.file_unique_id
+    ]
     metadata = {
         "title": sticker_set.title,
         "name": sticker_set.name,
-        "emojis": emoji_mapping
+        "emojis": emoji_mapping,
+        "files": {file_name: media.file_unique_id for media, file_name in assets}
     }
-    (pack_dir / "metadata.json").write_text(json.dumps(metadata, indent=4, ensure_ascii=False), encoding="utf-8")
+    return needed_stickers, metadata
+
+async def download_assets(context: ContextTypes.DEFAULT_TYPE, needed_stickers: list[tuple], targets: list) -> list[bool]:
+    # Get file URLs in parallel
+    file_paths = await asyncio.gather(*[get_file_path(context, media) for media, _ in needed_stickers])
+    # Download all assets in parallel over the shared session, one pack never takes every global slot
+    session: aiohttp.ClientSession = context.application.bot_data["http_session"]
+    pack_semaphore = asyncio.Semaphore(MAX_PACK_DOWNLOADS)
+    results = await asyncio.gather(*[
+        download_sticker(session, pack_semaphore, url, target) for url, target in zip(file_paths, targets)
+    ])
+    # The cached link may be what failed, so the next attempt asks get_file again
+    for (media, _), ok in zip(needed_stickers, results):
+        if not ok:
+            file_path_cache.pop(media.file_unique_id, None)
+    return results
 
-async def process_sticker_pack(update: Update, context: ContextTypes.DEFAULT_TYPE) -> tuple:
-    sticker = update.message.sticker
-    if not sticker.set_name:
-        await update.message.reply_text(MESSAGES["no_pack"])
-        raise ValueError("Sticker not part of a pack")
+async def download_pack_assets(context: ContextTypes.DEFAULT_TYPE, sticker_set, pack_dir: Path) -> tuple[dict, bool]:
+    # List the directory once instead of stat-ing every sticker path
+    try:
+        with os.scandir(pack_dir) as entries:
+            existing: set[str] = {entry.name for entry in entries}
+    except FileNotFoundError:
+        pack_dir.mkdir(parents=True, exist_ok=True)
+        existing = set()
+    known_files: dict[str, str] = {}
+    if "metadata.json" in existing:
+        previous = await asyncio.get_running_loop().run_in_executor(None, (pack_dir / "metadata.json").read_bytes)
+        # A damaged metadata file just means nothing on disk can be trusted, so the whole pack is downloaded again
+        try:
+            previous_metadata = orjson.loads(previous)
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"Invalid metadata for {pack_dir.name}, re-downloading pack: {e}")
+            previous_metadata = {}
+        files = previous_metadata.get("files") if isinstance(previous_metadata, dict) else None
+        if isinstance(files, dict):
+            known_files = files
+    needed_stickers, metadata = plan_pack_assets(sticker_set, existing, known_files)
+    if not needed_stickers:
+        return metadata, True
+    results = await download_assets(context, needed_stickers, [pack_dir / name for _, name in needed_stickers])
+    # Only record files that now hold the current Telegram file, so failed ones are needed again next time
+    for (_, file_name), ok in zip(needed_stickers, results):
+        if not ok:
+            metadata["files"].pop(file_name, None)
+    # Save metadata
+    await asyncio.get_running_loop().run_in_executor(None, save_pack_metadata, pack_dir, metadata)
+    return metadata, all(results)
+
+async def fetch_pack_assets(context: ContextTypes.DEFAULT_TYPE, sticker_set) -> tuple[dict[str, bytes], bool]:
+    # Keep every asset in memory for packs that only need to be zipped
+    needed_stickers, metadata = plan_pack_assets(sticker_set, set(), {})
+    buffers = [io.BytesIO() for _ in needed_stickers]
+    results = await download_assets(context, needed_stickers, buffers)
+    files: dict[str, bytes] = {
+        name: buffer.getvalue() for (_, name), buffer, ok in zip(needed_stickers, buffers, results) if ok
+    }
+    files["metadata.json"] = serialize_pack_metadata(metadata)
+    return files, all(results)
+
+def create_archive(source: Path | dict[str, bytes]) -> io.BytesIO:
+    # Build the archive in memory so it is never written to and re-read from disk.
+    # Stickers are already compressed, so store them as-is instead of deflating
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        if isinstance(source, dict):
+            for name, data in sorted(source.items()):
+                zf.writestr(name, data)
+        else:
+            for path in sorted(source.iterdir()):
+                if not path.is_file():
+                    continue
+                info = zipfile.ZipInfo.from_file(path, arcname=path.name)
+                info.compress_type = zipfile.ZIP_STORED
+                with path.open("rb") as src, zf.open(info, "w") as dst:
+                    shutil.copyfileobj(src, dst, length=IO_BUFFER_SIZE)
+    archive.seek(0)
+    return archive
+
+async def process_sticker_pack(context: ContextTypes.DEFAULT_TYPE, pack_name: str) -> tuple:
     # Get sticker pack information
-    sticker_set = await context.bot.get_sticker_set(sticker.set_name)
+    sticker_set = await context.bot.get_sticker_set(pack_name)
     return sticker_set, sticker_set.name, sticker_set.title
 
+def pack_fingerprint(sticker_set) -> tuple[str, ...]:
+    # file_unique_id changes whenever a file does, so this identifies the pack contents
+    fingerprint = [sticker.file_unique_id for sticker in sticker_set.stickers]
+    if sticker_set.thumbnail:
+        fingerprint.append(sticker_set.thumbnail.file_unique_id)
+    return tuple(fingerprint)
+
+async def build_and_send_archive(update: Update, context: ContextTypes.DEFAULT_TYPE, pack_name: str) -> tuple[str, str, tuple[str, ...], dict | None, bool]:
+    # Get pack information
+    sticker_set, pack_name, pack_title = await process_sticker_pack(context, pack_name)
+    fingerprint = pack_fingerprint(sticker_set)
+    # An expired archive whose pack has not changed since can still be resent without rebuilding it,
+    # only complete archives are ever cached
+    cached = archive_cache.get(pack_name)
+    if cached and cached[3] == fingerprint:
+        await update.message.reply_document(document=cached[2], caption=MESSAGE_TEMPLATES["archive_caption"](pack_title=pack_title))
+        return pack_title, cached[2], fingerprint, None, True
+    # Download assets
+    await update.message.reply_text(MESSAGE_TEMPLATES["downloading"](pack_title=pack_title, pack_name=pack_name))
+    metadata: dict | None = None
+    if SIGNAL_ENABLED or KEEP_FILES:
+        # Signal uploads read the stickers back from disk
+        pack_dir = DOWNLOADS_DIR / pack_name
+        metadata, complete = await download_pack_assets(context, sticker_set, pack_dir)
+        source: Path | dict[str, bytes] = pack_dir
+    else:
+        source, complete = await fetch_pack_assets(context, sticker_set)
+    # Create archive
+    loop = asyncio.get_running_loop()
+    archive = await loop.run_in_executor(None, create_archive, source)
+    # Send to user
+    with archive:
+        message = await update.message.reply_document(
+            document=InputFile(archive, filename=f"{pack_name}.zip", read_file_handle=False),
+            caption=MESSAGE_TEMPLATES["archive_caption"](pack_title=pack_title)
+        )
+    return pack_title, message.document.file_id, fingerprint, metadata, complete
+
+async def send_pack_archive(update: Update, context: ContextTypes.DEFAULT_TYPE, pack_name: str) -> tuple[tuple[str, ...], dict | None]:
+    # Resend a recently uploaded archive by its Telegram file id
+    cached = archive_cache.get(pack_name)
+    if cached and cached[0] > time.monotonic():
+        _, pack_title, document_id, fingerprint = cached
+        await update.message.reply_document(document=document_id, caption=MESSAGE_TEMPLATES["archive_caption"](pack_title=pack_title))
+        return fingerprint, None
+    # Coalesce onto a build of the same pack that is already in progress
+    pending = pending_archives.get(pack_name)
+    if pending:
+        result = await asyncio.shield(pending)
+        if result is None:
+            raise RuntimeError(f"Concurrent build of {pack_name} failed")
+        pack_title, document_id, fingerprint, metadata, _ = result
+        await update.message.reply_document(document=document_id, caption=MESSAGE_TEMPLATES["archive_caption"](pack_title=pack_title))
+        return fingerprint, metadata
+    future = asyncio.get_running_loop().create_future()
+    pending_archives[pack_name] = future
+    result = None
+    try:
+        result = await build_and_send_archive(update, context, pack_name)
+        # Re-insert so the dict stays ordered oldest first for eviction
+        archive_cache.pop(pack_name, None)
+        # An archive with missing stickers must not be resent, the next request retries the downloads
+        if result[4]:
+            archive_cache[pack_name] = (time.monotonic() + ARCHIVE_CACHE_TTL, *result[:3])
+            if len(archive_cache) > ARCHIVE_CACHE_SIZE:
+                del archive_cache[next(iter(archive_cache))]
+    finally:
+        future.set_result(result)
+        del pending_archives[pack_name]
+    return result[2], result[3]
+
+def signal_cache_key(pack_name: str, fingerprint: tuple[str, ...]) -> str:
+    # Tie the Signal pack to the Telegram pack contents, so an edited pack is uploaded again
+    content_hash = hashlib.blake2b("\n".join(fingerprint).encode(), digest_size=16).hexdigest()
+    return f"{pack_name}#{content_hash}"
+
 async def handle_sticker_pack(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
-        # Get pack information
-        sticker_set, pack_name, pack_title = await process_sticker_pack(update, context)
+        pack_name = update.message.sticker.set_name
+        fingerprint, metadata = await send_pack_archive(update, context, pack_name)
         pack_dir = DOWNLOADS_DIR / pack_name
-        pack_dir.mkdir(parents=True, exist_ok=True)
-        # Download assets
-        await update.message.reply_text(MESSAGES["downloading"].format(pack_title=pack_title, pack_name=pack_name))
-        await download_pack_assets(context, sticker_set, pack_dir)
-        # Create archive
-        loop = asyncio.get_running_loop()
-        archive_path = await loop.run_in_executor(None, shutil.make_archive, str(pack_dir), "zip", str(pack_dir))
-        # Send to user
-        with open(archive_path, 'rb') as f:
-            await update.message.reply_document(document=f, caption=MESSAGES["archive_caption"].format(pack_title=pack_title))
         # Handle Signal upload
-        user_id = update.effective_user.id
-        if signal_enabled and user_modes.get(user_id, False):
-            cache = read_signal_cache()
-            signal_url = cache.get(pack_name)
+        if SIGNAL_ENABLED and context.user_data.get("upload_mode", False):
+            cache_key = signal_cache_key(pack_name, fingerprint)
+            signal_url = signal_cache.get(cache_key)
             if not signal_url:
                 # Process the pack to add to signal
                 await update.message.reply_text(MESSAGES["signal_processing"])
-                signal_url = await upload_to_signal(pack_dir)
+                signal_url = await upload_to_signal(pack_dir, metadata)
                 if signal_url:
-                    cache[pack_name] = signal_url
-                    write_signal_cache(cache)
+                    signal_cache[cache_key] = signal_url
+                    await flush_signal_cache()
             if signal_url:
-                await update.message.reply_text(MESSAGES["signal_upload"].format(signal_url=signal_url))
+                await update.message.reply_text(MESSAGE_TEMPLATES["signal_upload"](signal_url=signal_url))
     except Exception as e:
         logger.error(f"Processing error: {str(e)}", exc_info=True)
         await update.message.reply_text(MESSAGES["error"])
 
+async def post_init(application: Application) -> None:
+    # Single session for the whole bot so pooled connections are reused across packs
+    connector = aiohttp.TCPConnector(
+        limit=200,
+        limit_per_host=64,
+        use_dns_cache=True,
+        ttl_dns_cache=600,
+        keepalive_timeout=75,
+        force_close=False
+    )
+    application.bot_data["http_session"] = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+    )
+
+async def post_shutdown(application: Application) -> None:
+    session: aiohttp.ClientSession | None = application.bot_data.pop("http_session", None)
+    if session:
+        await session.close()
+
 if __name__ == "__main__":
     # Create the bot
-    load_dotenv()
-    signal_enabled: bool = all([os.getenv("SIGNAL_UUID"), os.getenv("SIGNAL_PASSWORD")])
-    application = ApplicationBuilder().token(os.getenv("BOT_TOKEN")).build()
+    signal_cache.update(read_signal_cache())
+    application = (
+        ApplicationBuilder()
+        .token(os.getenv("BOT_TOKEN"))
+        .connection_pool_size(BOT_API_POOL_SIZE)
+        .connect_timeout(10)
+        .read_timeout(30)
+        .pool_timeout(10)
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     # Register handlers
     handlers: list = [
         CommandHandler("start", start),
         CommandHandler("help", help_cmd),
         CommandHandler("mode", mode_command),
-        MessageHandler(filters.Sticker.ALL, handle_sticker_pack),
+        MessageHandler(filters.Sticker.ALL & PACK_STICKER, handle_sticker_pack),
+        MessageHandler(filters.Sticker.ALL & ~PACK_STICKER, no_pack_sticker),
         CallbackQueryHandler(toggle_upload_callback, pattern="^toggle_upload$")
     ]
-    for handler in handlers:
-        application.add_handler(handler)
-    # Run the bot
+    application.add_handlers(handlers)
+    # Run the bot, on uvloop where it is available (it does not support Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        logger.info("uvloop not installed, using the default asyncio event loop")
     application.run_polling()